@@ -0,0 +1,62 @@
+import numpy as np
+from graph_reader import Edge_stream
+from graph import Graph, symmetric_weights
+
+"""
+Cut evaluation shared by all the solvers. A partition is given as a boolean vector (True for the
+vertices in S) or as a +-1 vector, the cut is computed without copying any submatrix:
+	- on an edge list, sum of the weights whose endpoints are on different sides, O(m)
+	- on a symmetric dense/sparse weight matrix W, (sum(W) - s^T W s)/4 = x^T L x/4
+The weights are a Graph (sum(W) is then computed only once), a matrix or an Edge_stream. Triangular
+matrices, as returned by graph_read, are symmetrized first.
+"""
+
+
+def partition_vector(S,n):
+	#boolean vector of size n from the list of vertices in S
+	in_S = np.zeros(n,dtype=bool)
+	in_S[list(S)] = True
+	return in_S
+
+
+def partition_signs(x):
+	#+-1 vector from a boolean or +-1 partition vector
+	x = np.asarray(x)
+	if x.dtype == bool: return np.where(x,1.,-1.)
+	return x.astype(float)
+
+
+def matrix_and_sum(weights):
+	if isinstance(weights,Graph): return weights.weights, weights.weight_sum
+	weights = symmetric_weights(weights)
+	return weights, weights.sum()
+
+
+def edge_cut_value(rows,cols,weights,x):
+	x = np.asarray(x)
+	if x.dtype != bool: x = x > 0
+	return np.sum(weights[x[rows] != x[cols]])
+
+
+def cut_value(weights,x):
+	if isinstance(weights,Edge_stream):
+		x = np.asarray(x)
+		return weights.cut_weight(x if x.dtype == bool else x > 0)
+	weights, total = matrix_and_sum(weights)
+	s = partition_signs(x)
+	return (total - s @ (weights @ s))/4
+
+
+def batch_cut_values(weights,X):
+	#X: k x n matrix of partitions (boolean or +-1), returns the k cut values at once
+	X = np.atleast_2d(X)
+	if isinstance(weights,Edge_stream):
+		in_S = X if X.dtype == bool else X > 0
+		values = np.zeros(len(in_S))
+		for rows,cols,w in weights:
+			values += (in_S[:,rows] != in_S[:,cols]) @ w
+		return values
+	weights, total = matrix_and_sum(weights)
+	S = partition_signs(X)
+	#(weights @ S.T) is n x k, one matrix product for dense and sparse alike
+	return (total - np.sum(S.T*(weights @ S.T),axis=0))/4
@@ -1,12 +1,93 @@
 import numpy as np 
-from itertools import combinations 
+import os
+from itertools import combinations, repeat
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
+from cut import partition_vector, cut_value, batch_cut_values
+from scipy import sparse
+from graph import as_graph
+from graph_reader import Edge_stream
+
+
+def dense_weights(graph):
+	#exact methods only run on small graphs, a dense symmetric copy without the diagonal (loops are never cut)
+	if isinstance(graph,Edge_stream):
+		raise ValueError('The exact enumeration needs the weight matrix, not an edge stream')
+	W = graph.weights.toarray() if sparse.issparse(graph.weights) else np.array(graph.weights,dtype=float)
+	np.fill_diagonal(W,0)
+	return W
+
+
+def gray_code_search(W,s,free):
+	#walks the 2^len(free) sign vectors obtained from s by flipping the vertices of free in Gray code order
+	#(step t flips free[trailing zeros of t]). h = W s is updated in O(deg) per flip and flipping v changes
+	#the cut by s_v h_v, so each partition costs O(deg) instead of a full evaluation. Returns best signs, value
+	neighbours = [np.nonzero(W[v])[0].tolist() for v in range(len(W))]
+	weights = [W[v,neighbours[v]].tolist() for v in range(len(W))]
+	start = np.asarray(s,dtype=float)
+	h = (W @ start).tolist()
+	value = (np.sum(W) - start @ W @ start)/4
+	s = start.tolist()
+	best, best_t = value, 0
+	for t in range(1,1 << len(free)):
+		v = free[(t & -t).bit_length()-1]
+		value += s[v]*h[v]
+		s[v] = -s[v]
+		for u,w in zip(neighbours[v],weights[v]): h[u] += 2*s[v]*w
+		if value > best: best, best_t = value, t
+	#the Gray code word of step t tells which vertices of free are flipped
+	gray = best_t ^ (best_t >> 1)
+	flipped = [v for i,v in enumerate(free) if gray >> i & 1]
+	best_s = start.copy()
+	best_s[flipped] = -best_s[flipped]
+	return best_s, best
+
+def sign_table(k):
+	#2^k x k table of +-1, row t holds the bits of t (bit set -> -1)
+	return 1. - 2.*((np.arange(1 << k)[:,None] >> np.arange(k)) & 1)
+
+
+def block_search(W,s,free,k=12,chunk=1 << 20):
+	#enumerates every sign of the vertices of free (the others keep their sign in s) by blocks: the low k
+	#vertices of free are the 2^k rows of a precomputed table T, each assignment of the high vertices
+	#(prefix) is evaluated with all its 2^k completions at once. With o the signs outside the low block,
+	#s^T W s = o^T W o + 2 T W_lo o + diag(T W_ll T^T), so a batch of prefixes costs two matrix products
+	k = min(k,len(free))
+	low, high = free[:k], free[k:]
+	T = sign_table(k)
+	internal = np.sum((T @ W[np.ix_(low,low)])*T,axis=1)
+	total = np.sum(W)
+	outer = np.array(s,dtype=float)
+	outer[low] = 0
+	best, best_s = -np.inf, None
+	batch = max(1,chunk >> k)
+	for start in range(0,1 << len(high),batch):
+		prefixes = np.arange(start,min(start+batch,1 << len(high)))
+		O = np.repeat(outer[None,:],len(prefixes),axis=0)
+		O[:,high] = 1. - 2.*((prefixes[:,None] >> np.arange(len(high))) & 1)
+		WO = O @ W
+		values = (total - np.sum(O*WO,axis=1)[:,None] - 2*WO[:,low] @ T.T - internal[None,:])/4
+		i, t = np.unravel_index(np.argmax(values),values.shape)
+		if values[i,t] > best:
+			best = values[i,t]
+			best_s = O[i].copy()
+			best_s[low] = T[t]
+	return best_s, best
+
+
+def prefix_search(W,s,free,kernel='block',block_bits=12):
+	#one slice of the exact enumeration, module level so that the process pool can pickle it
+	if kernel == 'block': return block_search(W,s,free,block_bits)
+	return gray_code_search(W,s,free)
+
 
 class Enumerative:
 
 	def __init__(self,coeff_matrix,vertices):
 		self.coeff_matrix = coeff_matrix
 		self.vertices = vertices
+		#symmetric weights and edge arrays, built once
+		self.graph = as_graph(coeff_matrix)
 
 	def enumerate(self,cutoff=3): #outputs all the combinasions for S set and else is in V/S
 
@@ -19,14 +100,49 @@ class Enumerative:
 
 	def weight_calculate(self,S):
 
-		T = [vertex for vertex in self.vertices if vertex not in S]
-		return np.sum(self.coeff_matrix[S,:][:,T])
+		return cut_value(self.graph,partition_vector(S,len(self.vertices)))
+
+	def batch_weight_calculate(self,subsets):
+		#all the cuts of a list of S sets in one matrix product
+		n = len(self.vertices)
+		lengths = [len(S) for S in subsets]
+		X = np.zeros((len(subsets),n),dtype=bool)
+		members = np.fromiter((v for S in subsets for v in S),dtype=np.int64,count=sum(lengths))
+		X[np.repeat(np.arange(len(subsets)),lengths),members] = True
+		return batch_cut_values(self.graph,X)
+
+
+	def exact_solve(self,kernel='block',block_bits=12,workers=1):
+		#exact maxcut over the 2^(n-1) partitions, vertex 0 stays in S since S and V/S give the same cut
+		#kernel: 'block' (2^block_bits partitions per matrix product) or 'gray' (one flip per partition)
+		#workers: number of processes (None for all the cores), the last free vertices are fixed to each
+		#prefix value and every worker enumerates the remaining ones
+		if kernel not in ('block','gray'): raise ValueError('Unknown enumeration kernel {}'.format(kernel))
+		n = len(self.vertices)
+		W = dense_weights(self.graph)
+		free = list(range(1,n))
+		if workers == 1:
+			s, value = prefix_search(W,np.ones(n),free,kernel,block_bits)
+			return s > 0, value
+		workers = workers or os.cpu_count()
+		#~4 slices per worker to balance the load
+		bits = min(len(free),(4*workers-1).bit_length())
+		fixed, free = free[len(free)-bits:], free[:len(free)-bits]
+		starts = []
+		for prefix in range(1 << bits):
+			s = np.ones(n)
+			s[fixed] = 1. - 2.*((prefix >> np.arange(bits)) & 1)
+			starts.append(s)
+		with ProcessPoolExecutor(workers) as executor:
+			results = list(executor.map(prefix_search,repeat(W),starts,repeat(free),repeat(kernel),repeat(block_bits)))
+		s, value = max(results,key=lambda result: result[1])
+		return s > 0, value
 
 
-	def solve(self,cutoff=3):
+	def solve(self,cutoff=3,batch_size=4096):
 
 		possible_arrays = self.enumerate(cutoff)
 		#Sm = (54, 59)
 		#self.weight_calculate(Sm)
 		
-		return max([self.weight_calculate(S) for S in possible_arrays])
+		return max([np.max(self.batch_weight_calculate(possible_arrays[i:i+batch_size])) for i in range(0,len(possible_arrays),batch_size)])
@@ -0,0 +1,73 @@
+import numpy as np
+import hashlib
+from scipy import sparse
+from graph_reader import Edge_stream, is_triangular
+
+"""
+Graph normalized once at construction and shared by all the solvers: symmetric weights (dense or
+scipy sparse), weighted degrees, upper triangle edge arrays and, on demand, the Laplacian. Solvers
+accept either a Graph or a raw coefficient matrix, which is wrapped with as_graph.
+"""
+
+
+def symmetric_weights(matrix):
+	#graphs read from files only hold the upper (or lower) triangle
+	if isinstance(matrix,Edge_stream): return matrix
+	if is_triangular(matrix): return matrix + matrix.T
+	return matrix
+
+
+def matrix_fingerprint(matrix):
+	#sha1 of a dense or sparse matrix, shape and dtype included
+	h = hashlib.sha1(str(matrix.shape).encode())
+	if sparse.issparse(matrix):
+		matrix = sparse.csr_matrix(matrix,copy=True)
+		matrix.sum_duplicates()
+		arrays = [matrix.data,matrix.indices,matrix.indptr]
+	else: arrays = [np.asarray(matrix)]
+	for array in arrays:
+		array = np.ascontiguousarray(array)
+		h.update(str(array.dtype).encode())
+		h.update(array.tobytes())
+	return h.hexdigest()
+
+
+class Graph:
+
+	def __init__(self,coeff_matrix):
+		self.weights = symmetric_weights(coeff_matrix)
+		if sparse.issparse(self.weights): self.weights = sparse.csr_matrix(self.weights)
+		self.n = self.weights.shape[0]
+		self.shape = self.weights.shape
+		#edges i < j as parallel arrays
+		if sparse.issparse(self.weights):
+			upper = sparse.triu(self.weights,1).tocoo()
+			upper.eliminate_zeros()
+			self.rows, self.cols, self.edge_weights = upper.row, upper.col, upper.data
+		else:
+			self.rows, self.cols = np.nonzero(np.triu(self.weights,1))
+			self.edge_weights = self.weights[self.rows,self.cols]
+		self.m = len(self.edge_weights)
+		self.degree = np.asarray(self.weights.sum(axis=1)).ravel()
+		#sum over the whole symmetric matrix, used by the cut formula (sum(W) - s^T W s)/4
+		self.weight_sum = self.degree.sum()
+		self._laplacian = None
+		self._fingerprint = None
+
+	@property
+	def laplacian(self):
+		if self._laplacian is None:
+			if sparse.issparse(self.weights): self._laplacian = (sparse.diags(self.degree) - self.weights).tocsr()
+			else: self._laplacian = np.diag(self.degree) - self.weights
+		return self._laplacian
+
+	def fingerprint(self):
+		#hash of the symmetric weights, computed once (key of the SDP cache)
+		if self._fingerprint is None: self._fingerprint = matrix_fingerprint(self.weights)
+		return self._fingerprint
+
+
+def as_graph(coeff_matrix):
+	#Graph objects and edge streams are used as they are, matrices are normalized once
+	if isinstance(coeff_matrix,(Graph,Edge_stream)): return coeff_matrix
+	return Graph(coeff_matrix)
@@ -1,20 +1,150 @@
 import numpy as np
 import math
+import os
+from itertools import islice
+from scipy import sparse as sp
 
 """
 We are simply reading graphs from already generated text files, and will simply return them as a
-adj_matrix to be used
+adj_matrix to be used (dense by default, or a symmetric scipy CSR matrix when sparse=True so that
+memory scales with the number of edges instead of n^2)
+
+The first read of a text instance also writes a binary copy next to it (CACHE_SUFFIX), laid out as
+a 64 bytes int64 header (magic, version, n, m, size and mtime of the text file, number of stored
+edges which can differ from the m announced in the header, 1 reserved) followed
+by int32 rows, int32 cols and float64 weights. Later reads memory-map it instead of parsing text, the
+cache is rebuilt as soon as the size or mtime of the text file changes.
+
+For edge lists that do not fit in memory, Edge_stream re-reads the text file in fixed size blocks
+of numpy arrays, solvers that only need sweeps over the edges can consume it directly.
 """
 
+CACHE_SUFFIX = '.mcbin'
+BLOCK_SIZE = 1 << 16
+CACHE_MAGIC = 0x4d43424e
+CACHE_VERSION = 1
+HEADER_LEN = 8
 
-def graph_read(path_to_file):
+
+def read_edges(path_to_file):
+	#bulk parse of the rudy/biqmaclib format: header "n m" then one "v1 v2 w" line per edge
+	#returns 0-indexed endpoints and float weights as numpy arrays
 	with open(path_to_file,'r') as f:
-		lines = f.readlines()
-		for idx,line in enumerate(lines,start=0):
-			if idx == 0: 
-				n,m = int(line.split()[0].strip()), int(line.split()[1].strip())
-				X = np.zeros((n,n))
-			else:
-				v1, v2, w = int(line.split()[0].strip()), int(line.split()[1].strip()), int(line.split()[2].strip())
-				X[v1-1,v2-1] = w
+		header = f.readline().split()
+		n,m = int(header[0]), int(header[1])
+		if m == 0: data = np.zeros((0,3))
+		else: data = np.loadtxt(f, ndmin=2, usecols=(0,1,2))
+	rows = data[:,0].astype(np.int64) - 1
+	cols = data[:,1].astype(np.int64) - 1
+	return n,m,rows,cols,data[:,2]
+
+
+def iter_edge_blocks(path_to_file,block_size=BLOCK_SIZE):
+	#yields (rows, cols, weights) blocks of at most block_size edges, 0-indexed like read_edges
+	with open(path_to_file,'r') as f:
+		f.readline()
+		while True:
+			lines = list(islice(f,block_size))
+			if not lines: return
+			data = np.loadtxt(lines, ndmin=2, usecols=(0,1,2))
+			if len(data) == 0: continue
+			yield data[:,0].astype(np.int64) - 1, data[:,1].astype(np.int64) - 1, data[:,2]
+
+
+class Edge_stream:
+
+	def __init__(self,path_to_file,block_size=BLOCK_SIZE):
+		self.path_to_file = path_to_file
+		self.block_size = block_size
+		with open(path_to_file,'r') as f:
+			header = f.readline().split()
+		self.n, self.m = int(header[0]), int(header[1])
+		self.shape = (self.n,self.n)
+
+	def __iter__(self):
+		#every iteration re-opens the file so the stream can be swept several times
+		return iter_edge_blocks(self.path_to_file,self.block_size)
+
+	def cut_weight(self,in_S):
+		#in_S: boolean vector of size n, True for vertices in S
+		in_S = np.asarray(in_S,dtype=bool)
+		total = 0
+		for rows,cols,weights in self:
+			total += np.sum(weights[in_S[rows] != in_S[cols]])
+		return total
+
+
+def cache_path(path_to_file):
+	return path_to_file + CACHE_SUFFIX
+
+
+def source_key(path_to_file):
+	stat = os.stat(path_to_file)
+	return stat.st_size, stat.st_mtime_ns
+
+
+def write_cache(path_to_file,n,m,rows,cols,weights):
+	size, mtime = source_key(path_to_file)
+	header = np.array([CACHE_MAGIC,CACHE_VERSION,n,m,size,mtime,len(rows),0],dtype=np.int64)
+	target = cache_path(path_to_file)
+	tmp = target + '.tmp{}'.format(os.getpid())
+	with open(tmp,'wb') as f:
+		header.tofile(f)
+		np.asarray(rows,dtype=np.int32).tofile(f)
+		np.asarray(cols,dtype=np.int32).tofile(f)
+		np.asarray(weights,dtype=np.float64).tofile(f)
+	#atomic so that parallel benchmark workers never see a half written cache
+	os.replace(tmp,target)
+
+
+def load_cache(path_to_file):
+	#returns None if there is no cache or if it is stale
+	target = cache_path(path_to_file)
+	if not os.path.exists(target): return None
+	header = np.fromfile(target,dtype=np.int64,count=HEADER_LEN)
+	if len(header) < HEADER_LEN or header[0] != CACHE_MAGIC or header[1] != CACHE_VERSION: return None
+	if tuple(header[4:6]) != source_key(path_to_file): return None
+	n,m,count = int(header[2]), int(header[3]), int(header[6])
+	#truncated or corrupt body (4+4+8 bytes per edge), rebuilt like a stale cache
+	offset = HEADER_LEN*8
+	if count < 0 or os.path.getsize(target) != offset + 16*count: return None
+	if count == 0: return n,m,np.zeros(0,dtype=np.int32),np.zeros(0,dtype=np.int32),np.zeros(0)
+	rows = np.memmap(target,dtype=np.int32,mode='r',offset=offset,shape=(count,))
+	cols = np.memmap(target,dtype=np.int32,mode='r',offset=offset+4*count,shape=(count,))
+	weights = np.memmap(target,dtype=np.float64,mode='r',offset=offset+8*count,shape=(count,))
+	return n,m,rows,cols,weights
+
+
+def cached_read_edges(path_to_file):
+	edges = load_cache(path_to_file)
+	if edges is not None: return edges
+	edges = read_edges(path_to_file)
+	try: write_cache(path_to_file,*edges)
+	except OSError: pass #read-only location, we simply keep parsing the text file
+	return edges
+
+
+def graph_read(path_to_file,sparse=False,cache=True):
+	if cache: n,m,rows,cols,weights = cached_read_edges(path_to_file)
+	else: n,m,rows,cols,weights = read_edges(path_to_file)
+	if sparse: return edges_to_csr(rows,cols,weights,n),n,m
+
+	X = np.zeros((n,n))
+	X[rows,cols] = weights
 	return X,n,m
+
+
+def edges_to_csr(rows,cols,weights,n):
+	#symmetric CSR adjacency matrix, each edge is stored in both directions. Like the dense path, only a
+	#triangular edge list is mirrored, files already listing i j and j i are kept as they are
+	X = sp.coo_matrix((weights,(rows,cols)),shape=(n,n),dtype=float).tocsr()
+	if is_triangular(X): X = (X + X.T).tocsr()
+	X.eliminate_zeros()
+	return X
+
+
+def is_triangular(matrix):
+	#some formats of graphs give upper/lower only, works on dense and scipy sparse inputs
+	if sp.issparse(matrix):
+		return sp.tril(matrix,-1).nnz == 0 or sp.triu(matrix,1).nnz == 0
+	return np.allclose(matrix, np.tril(matrix)) or np.allclose(matrix, np.triu(matrix))
@@ -1,4 +1,9 @@
 import numpy as np
+import heapq
+from scipy import sparse
+from graph_reader import Edge_stream, edges_to_csr
+from cut import partition_vector, cut_value
+from graph import as_graph
 
 
 class Greedy:
@@ -6,23 +11,30 @@ class Greedy:
 	def __init__(self,coeff_matrix,vertices):
 		self.coeff_matrix = coeff_matrix
 		self.vertices = vertices
+		#symmetric weights and edge arrays, built once
+		self.graph = as_graph(coeff_matrix)
 		
-		#getting the edges
-		self.edges = []
-		for row in range(len(coeff_matrix)):
-			for col in range(row+1,len(coeff_matrix)):
-				if self.coeff_matrix[row,col] != 0: self.edges.append([self.coeff_matrix[row,col],row,col])
+		#getting the edges, as parallel arrays (weight, row, col) with row < col for matrices
+		if isinstance(self.graph,Edge_stream):
+			blocks = list(self.graph)
+			self.weights = np.concatenate([weights for _,_,weights in blocks])
+			self.rows = np.concatenate([rows for rows,_,_ in blocks])
+			self.cols = np.concatenate([cols for _,cols,_ in blocks])
+			nonzero = self.weights != 0
+			self.weights, self.rows, self.cols = self.weights[nonzero], self.rows[nonzero], self.cols[nonzero]
+			#symmetric adjacency of the streamed edges, used by gain_solve
+			self.adjacency = edges_to_csr(self.rows,self.cols,self.weights,len(vertices))
+		else:
+			self.weights, self.rows, self.cols = self.graph.edge_weights, self.graph.rows, self.graph.cols
+			self.adjacency = self.graph.weights
 
 
 	def associate(self):
 		S = []
 		assigned = []
-		dummy = self.coeff_matrix.copy()
-		#sort the edge sets by weight
-		self.edges = sorted(self.edges ,key = lambda x: x[0],reverse=True)
-		#print(self.edges)
-		for item in self.edges:
-			_,i,j = item
+		#sort the edge sets by weight, decreasing (stable, ties keep the row-major order)
+		order = np.argsort(-self.weights,kind='stable')
+		for i,j in zip(self.rows[order].tolist(),self.cols[order].tolist()):
 		
 			if i in assigned and j in assigned: break
 			elif i in assigned: 
@@ -39,11 +51,44 @@ class Greedy:
 
 		return S
 
+	def gain_solve(self):
+		#Sahni-Gonzalez greedy: to_S[v]/to_U[v] is the weight between v and the placed vertices of S/U,
+		#the unplaced vertex with the best gain max(to_S,to_U) is placed on the side opposite to its heavier
+		#neighbourhood, a heap with lazy (stale) entries keeps it O((n+m) log n)
+		n = len(self.vertices)
+		A = self.adjacency
+		to_S, to_U = np.zeros(n), np.zeros(n)
+		in_S = np.zeros(n,dtype=bool)
+		placed = np.zeros(n,dtype=bool)
+		heap = [(0.,v) for v in range(n)]
+		value = 0.
+		while heap:
+			key, v = heapq.heappop(heap)
+			if placed[v] or -key != max(to_S[v],to_U[v]): continue
+			placed[v] = True
+			#ties go to S, like the smaller index heuristic of associate
+			if to_U[v] >= to_S[v]:
+				in_S[v] = True
+				value += to_U[v]
+				gain = to_S
+			else:
+				value += to_S[v]
+				gain = to_U
+			if sparse.issparse(A):
+				start, end = A.indptr[v], A.indptr[v+1]
+				neighbours, weights = A.indices[start:end], A.data[start:end]
+			else:
+				neighbours = np.nonzero(A[v])[0]
+				weights = A[v,neighbours]
+			for u,w in zip(neighbours.tolist(),weights.tolist()):
+				if placed[u]: continue
+				gain[u] += w
+				heapq.heappush(heap,(-max(to_S[u],to_U[u]),u))
+		return in_S, value
+
 	def weight_calculate(self,S):
 		#print(S)
-		T = [vertex for vertex in self.vertices if vertex not in S]
-		#print(T)
-		return np.sum(self.coeff_matrix[S,:][:,T])
+		return cut_value(self.graph,partition_vector(S,len(self.vertices)))
 
 	def solve(self):
 		S = self.associate()
@@ -1,10 +1,15 @@
 #Imported libs
 from math import *
-import random
 from graph_reader import *
+from rng import make_rng
+from cut import batch_cut_values
+from graph import as_graph
+from scipy import sparse
 """ 
 
 We implement here the 1/2-approx randomized algo for maxcut, we will also try to do the derandomized
+(method of conditional expectations, each vertex goes to the side which cuts the most weight towards
+the vertices already placed, which keeps at least half of the total weight)
 
 """
 
@@ -12,27 +17,50 @@ We implement here the 1/2-approx randomized algo for maxcut, we will also try to
 
 class Half_rand_algo:
 
-	def __init__(self,coeff_matrix,vertices):
+	def __init__(self,coeff_matrix,vertices,rng=None):
+		#rng: numpy Generator or seed
 		self.coeff_matrix = coeff_matrix
 		self.vertices = vertices
+		self.rng = make_rng(rng)
+		#symmetric weights and edge arrays, built once
+		self.graph = as_graph(coeff_matrix)
 
-	def solve(self):
+	def random_partitions(self,trials=1):
+		#trials x n boolean matrix, True for the vertices in U, all the assignments drawn at once
+		n = self.graph.shape[0]
+		partitions = np.zeros((trials,n),dtype=bool)
+		partitions[:,self.vertices] = self.rng.random((trials,len(self.vertices))) >= 0.5
+		return partitions
+
+	def solve(self,trials=1):
 		#input N: number of vertex , W: weights matrix
-		#output U: first set, v: value of the cut
+		#output v: value of the best cut over the trials
 
 		assert self.coeff_matrix.shape[0] == len(self.vertices)
 		#assert check_symmetrys(W)
 
-		U,S = [],[]
-
-		#just heuristic random
-		for v_idx in self.vertices:
-
-			if random.random() >= 0.5:  U.append(v_idx)
-			else: S.append(v_idx)
-
-		#print(self.coeff_matrix[U,:][:,S])
-
-		return np.sum(self.coeff_matrix[U,:][:,S])
-
+		#just heuristic random, the cuts of all the trials are evaluated in one batch
+		values = batch_cut_values(self.graph,self.random_partitions(trials))
+		return np.max(values)
 
+	def derandomized_solve(self):
+		#method of conditional expectations, O(n+m) on sparse weights and O(n^2) on dense ones: to_U[v] and
+		#to_S[v] are the weights from v to the vertices already in U and in S, v goes to the side cutting the
+		#most, then its neighbours are updated
+		#output U (boolean vector), v: value of the cut
+		if isinstance(self.graph,Edge_stream):
+			raise ValueError('The derandomized algorithm needs the adjacency of each vertex, not an edge stream')
+		W = self.graph.weights
+		n = W.shape[0]
+		in_U = np.zeros(n,dtype=bool)
+		to_U, to_S = np.zeros(n), np.zeros(n)
+		value = 0
+		for v in self.vertices:
+			in_U[v] = to_S[v] >= to_U[v]
+			value += max(to_S[v],to_U[v])
+			gains = to_U if in_U[v] else to_S
+			if sparse.issparse(W):
+				start, end = W.indptr[v], W.indptr[v+1]
+				gains[W.indices[start:end]] += W.data[start:end]
+			else: gains += W[v]
+		return in_U, value
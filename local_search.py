@@ -12,8 +12,10 @@ if len(sys.argv) < 2:
 
 
 def read_integers(filename):
+    #generator so that the file is never materialized as a whole list of ints
     with open(filename) as f:
-        return [int(elem) for elem in f.read().split()]
+        for line in f:
+            for elem in line.split(): yield int(elem)
 
 
 with localsolver.LocalSolver() as ls:
@@ -0,0 +1,20 @@
+import numpy as np
+
+"""
+Random number generation of the randomized solvers. Every solver takes a numpy Generator or a seed
+(None for fresh entropy) instead of using the global random/np.random state, and independent streams
+for parallel workers are spawned from a single seed through SeedSequence so that runs are reproducible.
+"""
+
+
+def make_rng(seed=None):
+	#seed: Generator (used as it is), int, SeedSequence or None
+	if isinstance(seed,np.random.Generator): return seed
+	return np.random.default_rng(seed)
+
+
+def spawn_rngs(seed,k):
+	#k independent generators, e.g. one per benchmark worker
+	if isinstance(seed,np.random.Generator): return seed.spawn(k)
+	if not isinstance(seed,np.random.SeedSequence): seed = np.random.SeedSequence(seed)
+	return [np.random.default_rng(child) for child in seed.spawn(k)]
@@ -0,0 +1,157 @@
+import numpy as np
+import time
+import cvxpy as cp
+from scipy import sparse
+from scipy import linalg
+from scipy.sparse import linalg as sparse_linalg
+from sdp_solver import Grad_Proj, gram_factor
+from graph import as_graph
+from rng import make_rng
+
+"""
+Registry of the backends solving the maxcut SDP relaxation: max <C,X> s.t. diag(X) = 1, X PSD with
+C = -W, W the symmetric weights of the graph. Every backend takes W, the size of the graph, an optional
+warm start and its own options, and returns a Sdp_result (factor V and/or X, objective, duality gap, time)
+so that they can be selected by name and benchmarked against each other.
+"""
+
+SDP_BACKENDS = {}
+
+
+def register_backend(name):
+	def decorator(backend):
+		SDP_BACKENDS[name] = backend
+		return backend
+	return decorator
+
+
+class Sdp_result:
+
+	def __init__(self,backend,V=None,X=None,objective=None,gap=None,info=None):
+		#V: factor whose rows are the vectors (V V^T = X), X: Gram matrix, at least one of them is set
+		self.backend = backend
+		self.V, self.X = V, X
+		self.objective = objective
+		#dual bound - primal value, None when the backend cannot certify it
+		self.gap = gap
+		self.info = info if info is not None else {}
+		self.time = None
+
+	def solution(self):
+		return self.V if self.V is not None else self.X
+
+
+def available_backends():
+	#backends whose underlying solver is installed
+	installed = cp.installed_solvers()
+	return [name for name,backend in SDP_BACKENDS.items() if getattr(backend,'solver',None) in (None,*installed)]
+
+
+def run_backend(name,coeff_matrix,n,warm_start=None,rng=None,**options):
+	#coeff_matrix: Graph or coefficient matrix of the graph, rng: Generator or seed of randomized backends
+	if name not in SDP_BACKENDS:
+		raise ValueError('Unknown SDP backend {}, registered: {}'.format(name,sorted(SDP_BACKENDS)))
+	weights = as_graph(coeff_matrix).weights
+	start = time.perf_counter()
+	result = SDP_BACKENDS[name](weights,n,warm_start=warm_start,rng=rng,**options)
+	result.time = time.perf_counter()-start
+	return result
+
+
+def factor_duality_gap(C,V):
+	#certificate for a factor V: y_i = (C X)_ii is the dual guess, Diag(y) - C is shifted by its
+	#smallest eigenvalue to make it PSD, the gap is sum(y) - n*min(lambda_min,0) - <C,X>
+	CV = C @ V
+	y = np.sum(np.multiply(CV,V),axis=1)
+	primal = np.sum(y)
+	if sparse.issparse(C):
+		S = sparse.diags(y) - C
+		lambda_min = sparse_linalg.eigsh(S,k=1,which='SA',return_eigenvectors=False)[0]
+	else:
+		S = np.diag(y) - C
+		lambda_min = linalg.eigvalsh(S,subset_by_index=[0,0])[0]
+	return primal, np.sum(y) - len(y)*min(lambda_min,0) - primal
+
+
+def perturbed_identity(n,rng=None):
+	#feasible starting X of the grad method: identity with 100 random perturbations, X = Y Y^T
+	rng = make_rng(rng)
+	X = np.diag(np.ones(n))
+	for _ in range(100):
+		x, y = rng.integers(0,n-1), rng.integers(0,n-1)
+		if x==y: continue
+		X[x,y] = 2*rng.random()
+	return np.matmul(X,X.T)
+
+
+def grad_result(name,g,C,gap,solve_options):
+	L, trace = g.solve(return_trace=True,**solve_options)
+	info = {'iterations':len(trace),'trace':trace}
+	if gap:
+		objective, duality_gap = factor_duality_gap(C,L)
+		return Sdp_result(name,V=L,objective=objective,gap=duality_gap,info=info)
+	return Sdp_result(name,V=L,objective=g.objective_func(L),info=info)
+
+
+@register_backend('grad')
+def grad_backend(weights,n,warm_start=None,rng=None,x_matrix=None,gap=True,**solve_options):
+	#Method of Gradient projection on the full lower triangular factor
+	rng = make_rng(rng)
+	if x_matrix is None and warm_start is None: x_matrix = perturbed_identity(n,rng)
+	C = -weights
+	g = Grad_Proj(C,x_matrix,l_init=warm_start,symmetrize=False,rng=rng)
+	return grad_result('grad',g,C,gap,solve_options)
+
+grad_backend.randomized = True
+
+
+@register_backend('lowrank')
+def lowrank_backend(weights,n,warm_start=None,rng=None,rank=None,gap=True,**solve_options):
+	#Burer-Monteiro: same projected gradient on a n x k factor, k ~ sqrt(2n)
+	if rank is None: rank = int(np.ceil(np.sqrt(2*n)))
+	C = -weights
+	g = Grad_Proj(C,rank=rank,l_init=warm_start,symmetrize=False,rng=rng)
+	return grad_result('lowrank',g,C,gap,solve_options)
+
+lowrank_backend.randomized = True
+
+
+def standard_problem(C):
+	#max <C,X> s.t. diag(X) = 1, X PSD. C is a constant (kept sparse when the graph is): a cp.Parameter
+	#C would let cvxpy reuse the canonicalization but costs a parameter tensor of ~n^3 entries
+	n = C.shape[0]
+	X = cp.Variable((n,n), PSD=True)
+	prob = cp.Problem(cp.Maximize(cp.sum(cp.multiply(C,X))), [cp.diag(X) == 1])
+	return prob, X
+
+
+def cvxpy_backend(name,solver=None,**default_options):
+	#registers a cvxpy backend, solver None lets cvxpy pick, default_options are the tuned tolerances
+	def backend(weights,n,warm_start=None,rng=None,factor_tol=1e-6,**options):
+		#rng is unused, the interior point/splitting solvers are deterministic
+		#cvxpy gives no way to pass a starting X to the solver (SCS only restarts from its own previous
+		#solve of the same problem), so a warm start is refused instead of being silently ignored
+		if warm_start is not None:
+			raise ValueError('The cvxpy backend {} does not accept a warm start, use grad or lowrank'.format(name))
+		#graphs are rarely dense, CSR keeps the canonicalization in O(m)
+		C = -sparse.csr_matrix(weights)
+		prob, X = standard_problem(C)
+		solver_options = dict(default_options,**options)
+		prob.solve(solver=solver,**solver_options)
+		dual = prob.constraints[0].dual_value
+		gap = None if dual is None else abs(np.sum(dual) - prob.value)
+		info = {'status':prob.status,'solver':prob.solver_stats.solver_name,'iterations':prob.solver_stats.num_iters}
+		#factorization stage, the rounding needs the vectors and not the Gram matrix
+		V = gram_factor(X.value,factor_tol)
+		info['rank'] = V.shape[1]
+		return Sdp_result(name,V=V,X=X.value,objective=prob.value,gap=gap,info=info)
+	backend.solver = solver
+	register_backend(name)(backend)
+	return backend
+
+
+#Standard method, python lib CVX with its default solver
+cvxpy_backend('standard')
+cvxpy_backend('scs',cp.SCS,eps=1e-5)
+cvxpy_backend('clarabel',cp.CLARABEL,tol_gap_rel=1e-7,tol_feas=1e-7)
+cvxpy_backend('cvxopt',cp.CVXOPT,abstol=1e-7,reltol=1e-6)
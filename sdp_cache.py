@@ -0,0 +1,84 @@
+import numpy as np
+import hashlib
+import os
+import json
+from collections import OrderedDict
+from scipy import sparse
+from graph import Graph, matrix_fingerprint
+from sdp_backends import Sdp_result
+
+"""
+Cache of SDP solutions so that all the rounding methods and the repeated benchmark runs on the same
+graph share a single solve. Sdp_result objects (solution, objective, gap, info, time) are kept in an
+in-memory LRU keyed by a hash of the coefficient matrix and of the method, and optionally persisted as
+.npz files in a directory.
+"""
+
+
+def value_fingerprint(value):
+	#part of a cache key for an option value: arrays are hashed since numpy shortens the repr of large ones
+	if isinstance(value,np.ndarray) or sparse.issparse(value): return matrix_fingerprint(value)
+	return repr(value)
+
+
+def save_result(path,result):
+	#arrays as they are, scalars and info (status, iterations, trace...) as a json header
+	arrays = {name:getattr(result,name) for name in ('V','X') if getattr(result,name) is not None}
+	meta = {'backend':result.backend,'objective':result.objective,'gap':result.gap,'time':result.time,'info':result.info}
+	np.savez(path,meta=json.dumps(meta,default=float),**arrays)
+
+
+def load_result(path):
+	with np.load(path) as f:
+		#files of the previous format only hold the solution, they are solved again
+		if 'meta' not in f: return None
+		meta = json.loads(str(f['meta']))
+		V = f['V'] if 'V' in f else None
+		X = f['X'] if 'X' in f else None
+	result = Sdp_result(meta['backend'],V=V,X=X,objective=meta['objective'],gap=meta['gap'],info=meta['info'])
+	result.time = meta['time']
+	return result
+
+
+class Sdp_cache:
+
+	def __init__(self,maxsize=32,directory=None):
+		self.maxsize = maxsize
+		self.directory = directory
+		self.memory = OrderedDict()
+		if directory is not None: os.makedirs(directory,exist_ok=True)
+
+	def key(self,matrix,method):
+		#matrix: coefficient matrix or Graph (whose fingerprint is computed only once)
+		if isinstance(matrix,Graph): fingerprint = matrix.fingerprint()
+		else: fingerprint = matrix_fingerprint(matrix)
+		return hashlib.sha1((str(method)+fingerprint).encode()).hexdigest()
+
+	def path(self,key):
+		return os.path.join(self.directory,key+'.npz')
+
+	def get(self,key):
+		if key in self.memory:
+			self.memory.move_to_end(key)
+			return self.memory[key]
+		if self.directory is not None and os.path.exists(self.path(key)):
+			result = load_result(self.path(key))
+			if result is not None: self.store(key,result)
+			return result
+		return None
+
+	def put(self,key,result):
+		self.store(key,result)
+		if self.directory is not None: save_result(self.path(key),result)
+
+	def store(self,key,result):
+		self.memory[key] = result
+		self.memory.move_to_end(key)
+		while len(self.memory) > self.maxsize: self.memory.popitem(last=False)
+
+	def clear(self):
+		self.memory.clear()
+
+
+#default cache shared by every Sdp_relax_algo instance
+SDP_CACHE = Sdp_cache()
@@ -1,78 +1,174 @@
 import numpy as np
 from scipy import linalg
+from scipy import sparse
+from rng import make_rng
 from tqdm import tqdm
 
 # IMPLEMENTATION OF DIFFERENT METHOD TO SOLVE SDP
+# Grad_Proj works either on the full lower triangular factor L (n x n, X = L L^T) or, when a rank k is
+# given, on a Burer-Monteiro low-rank factor L (n x k), k ~ sqrt(2n) is enough for the optimum of
+# the maxcut SDP, so an iteration costs O(m k) on sparse input instead of O(n^3)
+
+
+def gram_factor(x_matrix,tol=1e-8):
+	#V with V V^T ~ X, rows are the vectors, computed once so that rounding works on n x r instead of n x n
+	#negative eigenvalues coming from solver round-off are clipped and only the eigenvalues above
+	#tol * largest eigenvalue are kept, r is the numerical rank of X
+	values, vectors = linalg.eigh(x_matrix)
+	values, vectors = values[::-1], vectors[:,::-1]
+	rank = max(1,int(np.sum(values > tol*max(values[0],0))))
+	return vectors[:,:rank]*np.sqrt(np.clip(values[:rank],0,None))
+
+
+def as_factor(warm_start):
+	#a square symmetric matrix is taken as a Gram matrix X, anything else as a factor V (rows = vectors)
+	warm_start = np.asarray(warm_start,dtype=float)
+	if warm_start.shape[0] == warm_start.shape[1] and np.allclose(warm_start,warm_start.T):
+		return gram_factor(warm_start)
+	return warm_start
 
 
 class Grad_Proj:
 
-	def __init__(self,coeff_matrix, x_matrix):
+	def __init__(self,coeff_matrix, x_matrix=None, rank=None, l_init=None, symmetrize=True, rng=None):
 		# the matrix of input is representing C
-		self.coeff_matrix = coeff_matrix + coeff_matrix.T
+		# l_init: warm start, previous factor L/V or primal X of a related instance
+		# symmetrize: C is coeff_matrix + coeff_matrix^T, False when coeff_matrix is already the symmetric C
+		# rng: numpy Generator or seed of the random initializations
+		self.rng = make_rng(rng)
+		self.coeff_matrix = coeff_matrix + coeff_matrix.T if symmetrize else coeff_matrix
 		self.x_matrix = x_matrix
+		self.rank = rank
 		#initializations
-		#lower triangle
-		self.l_triangle = self.l_triangle_init()
+		#lower triangle, or n x rank factor in low-rank mode
+		if l_init is not None: self.l_triangle = self.warm_init(l_init)
+		elif rank is None: self.l_triangle = self.l_triangle_init()
+		else: self.l_triangle = self.low_rank_init(rank)
+		#lower triangular mask (diagonal included, the diagonal of L moves too), built once
+		if rank is None: self.lower_mask = np.tri(*self.l_triangle.shape,k=0,dtype=bool)
+		#buffers reused across iterations: gradient, projected gradient, line search candidate
+		self.grad = np.empty_like(self.l_triangle)
+		self.grad_proj = np.empty_like(self.l_triangle)
+		self.next_l = np.empty_like(self.l_triangle)
 
-	def objective_func(self,l_matrix):
-		return np.trace(np.matmul(self.coeff_matrix,np.matmul(l_matrix,l_matrix.T)))
+	def objective_func(self,l_matrix,cl_matrix=None):
+		#trace(C L L^T) = sum((C L) * L) without forming the n x n matrix L L^T
+		#cl_matrix: C @ l_matrix when it is already known
+		if cl_matrix is None: cl_matrix = self.coeff_matrix @ l_matrix
+		return np.sum(np.multiply(cl_matrix, l_matrix))
 
 	def l_triangle_init(self):
 		#initialization of L using Cholesky from feasible solution of X
 		return linalg.cholesky(self.x_matrix, lower=True)
 
+	def low_rank_init(self,rank):
+		#random unit rows, any such L is feasible (diag(L L^T) = 1)
+		n = self.coeff_matrix.shape[0]
+		return self.normalize(self.rng.normal(0,1,(n,rank)))
+
+	def warm_init(self,warm_start):
+		#factor of the warm start with the shape the method works on, rows normalized
+		V = as_factor(warm_start)
+		n, width = V.shape
+		if self.rank is None:
+			#lower triangular L with L L^T = V V^T: V = L Q^T where V^T = Q L^T
+			r_matrix = np.linalg.qr(V.T,mode='r')
+			L = np.zeros((n,n))
+			L[:,:r_matrix.shape[0]] = r_matrix.T
+		elif width > self.rank:
+			#best rank-k approximation of V V^T
+			u, sigma, _ = np.linalg.svd(V,full_matrices=False)
+			L = u[:,:self.rank]*sigma[:self.rank]
+		elif width < self.rank:
+			#small noise in the extra columns, zero columns would never move
+			L = np.hstack((V,1e-3*self.rng.normal(0,1,(n,self.rank-width))))
+		else: L = V.copy()
+		return self.normalize(L)
+
 	def lower_keep(self, matrix):
-		#keep lower triangle and replace by zero all the other number
-		n = matrix.shape[0]
-		lower_ones = np.tril(np.ones((n,n)),-1)
-		return np.multiply(matrix, lower_ones)
+		#keep lower triangle and replace by zero all the other number, in place
+		return np.multiply(matrix, self.lower_mask, out=matrix)
 
 	def normalize(self, l_matrix):
-		for row in range(l_matrix.shape[0]):
-			row_norm = np.sqrt(sum(l_matrix[row,:]**2))
-			try: l_matrix[row,:] = l_matrix[row,:]/row_norm 
-			except: 
-				print('Division by zero')
-				return None
+		#every row scaled to unit norm, in place
+		row_norm = np.sqrt(np.einsum('ij,ij->i',l_matrix,l_matrix))
+		if np.any(row_norm == 0):
+			print('Division by zero')
+			return None
+		l_matrix /= row_norm[:,None]
 		return l_matrix
 
 	def gradient_step(self, l_matrix):
 		#Finding the projected gradient step such that point is still feasible
+		#outputs are the reused buffers self.grad and self.grad_proj, f(l_matrix) is kept in self.value
 		def grad_projection(g_matrix):
-			projected = g_matrix.copy()
-			for row in range(g_matrix.shape[0]):
-				projected[row,:] -= np.dot(g_matrix[row,:],l_matrix[row,:])*l_matrix[row,:]
-			return projected
-		grad = 2*self.lower_keep(np.matmul(self.coeff_matrix,l_matrix))
+			#remove from each row of the gradient its component along the same row of L
+			dots = np.einsum('ij,ij->i',g_matrix,l_matrix)
+			np.multiply(l_matrix, dots[:,None], out=self.grad_proj)
+			return np.subtract(g_matrix, self.grad_proj, out=self.grad_proj)
+		if sparse.issparse(self.coeff_matrix): self.grad[...] = self.coeff_matrix @ l_matrix
+		else: np.matmul(self.coeff_matrix, l_matrix, out=self.grad)
+		self.value = self.objective_func(l_matrix, self.grad)
+		grad = np.multiply(self.grad, 2, out=self.grad)
+		#the full factor has to stay lower triangular, the low-rank one has no structure to keep
+		if self.rank is None: grad = self.lower_keep(grad)
 		return grad, grad_projection(grad)
 
-	def step_alpha(self,sig,alpha_init,l_matrix,grad,grad_proj):
+	def step_alpha(self,sig,alpha_init,l_matrix,grad,grad_proj,value=None):
 		#line search, here the paper uses Armijo
+		#f(l_matrix) and the directional derivative <grad,grad_proj> are computed once for all the halvings
+		#the candidate of the returned alpha is left in self.next_l
+		if value is None: value = self.objective_func(l_matrix)
+		slope = sig*np.sum(np.multiply(grad,grad_proj))
 		def inequality_check(alpha):
-			if alpha == 0: return 0
-			nextL = self.normalize(l_matrix+alpha*grad_proj)
-			left = self.objective_func(nextL)-self.objective_func(l_matrix)
-			right = sig*alpha*np.trace(np.matmul(grad,grad_proj))
+			if alpha == 0: return False
+			nextL = np.multiply(grad_proj, alpha, out=self.next_l)
+			nextL = self.normalize(np.add(nextL, l_matrix, out=nextL))
+			left = self.objective_func(nextL)-value
+			right = alpha*slope
 			#print(right)	
-			#print(sum([grad_proj[i,i] for i in range(grad_proj.shape[0])]))
-			#print(sum([np.matmul(grad,grad_proj)[i,i] for i in range(grad.shape[0])]))
-			if right == 0 and left>0 and alpha < 2: return False
-			#print('Trigger')
-			if left < 0: return True
-			return left > right
+			#keep halving while the increase is not sufficient (Armijo for a maximization)
+			return left < right
 		
 		alpha = alpha_init 
 		while inequality_check(alpha):  alpha = alpha/2
 		return alpha
 
-	def solve(self, sig=0.5, alpha_init=10):
-		
-		for _ in range(100):
+	def initial_step(self,step,alpha_init,alpha,P):
+		#starting point of the line search
+		#'fixed': alpha_init every iteration, 'double': twice the previous alpha, 'bb': Barzilai-Borwein
+		if step == 'fixed' or alpha is None: return alpha_init
+		if step == 'double': return 2*alpha
+		#after the swap of solve, self.next_l holds the previous L
+		s_matrix = self.l_triangle - self.next_l
+		y_matrix = P - self.prev_proj
+		sy = abs(np.sum(np.multiply(s_matrix,y_matrix)))
+		if sy == 0: return alpha_init
+		return np.sum(np.multiply(s_matrix,s_matrix))/sy
+
+	def solve(self, sig=0.5, alpha_init=10, max_iter=100, tol=None, grad_tol=None, step='fixed', return_trace=False):
+		#tol: stop when the relative change of the objective between two iterations is below tol
+		#grad_tol: stop when the Frobenius norm of the projected gradient is below grad_tol
+		#step: how the Armijo search is started, see initial_step
+		#the per-iteration trace (objective, projected gradient norm, alpha) is kept in self.trace
+		self.trace = []
+		if step == 'bb': self.prev_proj = np.empty_like(self.l_triangle)
+		alpha = None
+		for iteration in range(max_iter):
 			grad, P = self.gradient_step(self.l_triangle)
-			alpha = self.step_alpha(sig,alpha_init,self.l_triangle,grad,P)
+			grad_norm = np.linalg.norm(P)
+			previous = self.trace[-1]['objective'] if self.trace else None
+			self.trace.append({'iteration':iteration, 'objective':self.value, 'grad_norm':grad_norm, 'alpha':None})
+			if tol is not None and previous is not None and abs(self.value-previous) <= tol*max(1,abs(previous)): break
+			if grad_tol is not None and grad_norm <= grad_tol: break
+
+			alpha_start = self.initial_step(step,alpha_init,alpha,P)
+			if step == 'bb': np.copyto(self.prev_proj,P)
+			alpha = self.step_alpha(sig,alpha_start,self.l_triangle,grad,P,self.value)
 			#print(alpha)
-			self.l_triangle = self.normalize(self.l_triangle+alpha *P)
-			if alpha == 0: return self.l_triangle
+			self.trace[-1]['alpha'] = alpha
+			if alpha == 0: break
+			#the line search already built normalize(L + alpha P), swap it in instead of recomputing it
+			self.l_triangle, self.next_l = self.next_l, self.l_triangle
+		if return_trace: return self.l_triangle, self.trace
 		return self.l_triangle
-
@@ -2,7 +2,11 @@
 import numpy as np
 import math
 from sdp_solver import *
-import cvxpy as cp
+from cut import cut_value, batch_cut_values
+from graph import as_graph
+from rng import make_rng
+from sdp_cache import SDP_CACHE, value_fingerprint
+from sdp_backends import run_backend, SDP_BACKENDS
 
 """ 
 
@@ -11,97 +15,101 @@ We implement here the 0.878-approx randomized algo for maxcut, we will also try
 """
 ############################################################################
 
+def hyperplane_rounding(V,R):
+	#rows of V are the vectors of the relaxation (V V^T = X), rows of R the normals of the hyperplanes
+	#vertex i goes in S for hyperplane k iff <v_i,r_k> > 0, outputs a (K,n) boolean matrix
+	return np.atleast_2d(R) @ V.T > 0
+
+
 class Sdp_relax_algo:
 
-	def __init__(self,coeff_matrix,n):
+	def __init__(self,coeff_matrix,n,cache=SDP_CACHE,warm_start=None,sdp_options=None,rng=None):
+		#cache: Sdp_cache shared between instances (None to always re-solve)
+		#warm_start: factor L/V or primal X of a related instance, e.g. the .V of a previous solve, only the
+		#grad and lowrank methods can use it (the cvxpy methods raise a ValueError)
+		#sdp_options: options of the SDP backend (tolerances, rank, ...)
+		#rng: numpy Generator or seed used by the randomized backends and by the hyperplanes
+		self.rng = make_rng(rng)
+		#state of the generator before any draw, part of the cache key of the randomized backends so that
+		#a seeded instance never gets the solve of another seed (unseeded instances share their solves)
+		self.seed = None if rng is None else repr(self.rng.bit_generator.state)
 		self.matrix, self.n = coeff_matrix, n
+		#symmetric weights, degrees, edges... built once and used by every solve and rounding
+		self.graph = as_graph(coeff_matrix)
+		self.cache = cache
+		self.warm_start = warm_start
+		self.sdp_options = sdp_options if sdp_options is not None else {}
+		#last SDP solution (factor for grad/lowrank, X for standard) and the Sdp_result of the last solve
+		self.V = None
+		self.result = None
 		#print(self.matrix)
-		self.X = np.diag(np.ones(n))
-		for _ in range(100):
-			x, y = np.random.randint(0,n-1), np.random.randint(0,n-1)
-			if x==y: continue
-			self.X[x,y] = 2*np.random.random()
-		self.X = np.matmul(self.X,self.X.T)
 		self.vertices = [i for i in range(n)]
 
 	def sdp_solve(self,method='grad'):
-		#Method of Gradient projection
-		if method == 'grad':
-			#print(self.matrix)
-			#print(self.X_init)
-			g = Grad_Proj(self.matrix,self.X)
-			Y = g.solve()
-		
-		#Standard method, python lib CVX
-		if method == 'standard':
-			C = -(self.matrix+self.matrix.T)
-			A = []
-			b = []
-			for i in range(self.n):
-				tmp = 	np.zeros((self.n,self.n))
-				tmp[i,i] = 1
-				A.append(tmp)
-				b.append(1)
-
-			X = cp.Variable((self.n,self.n), PSD=True)
-			constraints = [
-				cp.trace(A[i] @ X) == b[i] for i in range(self.n)
-			]			
-			prob = cp.Problem(cp.Maximize(cp.trace(C @ X)),
-					   constraints)
-			prob.solve()
-
-			Y = prob.solution.primal_vars[list(prob.solution.primal_vars.keys())[0]]
-
-		return Y
+		#method: name of a backend of sdp_backends.SDP_BACKENDS, self.sdp_options are passed to it
+		#outputs the factor V when the backend gives one, X otherwise; metadata are kept in self.result
+		if self.cache is not None:
+			options = [(name,value_fingerprint(value)) for name,value in sorted(self.sdp_options.items())]
+			if self.warm_start is not None: options.append(('warm_start',value_fingerprint(self.warm_start)))
+			if getattr(SDP_BACKENDS.get(method),'randomized',False): options.append(('rng',self.seed))
+			key = self.cache.key(self.graph,method+repr(options))
+			result = self.cache.get(key)
+		else: result = None
+
+		if result is None:
+			result = run_backend(method,self.graph,self.n,warm_start=self.warm_start,rng=self.rng,**self.sdp_options)
+			if self.cache is not None: self.cache.put(key,result)
+
+		self.result = result
+		self.V = result.solution()
+		return self.V
 
 	def proba_rounding_vector(self,method='standard'):
 
 		V = self.sdp_solve(method=method) 
-		N = len(V)
+		N = V.shape[1]
 
 		# Different Random Generators for symmetrical vector
 		#Gen1
-		r = np.random.normal(0,1,N)
+		r = self.rng.normal(0,1,N)
 		r /= np.linalg.norm(r, axis=0)
 		
-		return np.matmul(r,V)>0
+		return hyperplane_rounding(V,r)[0]
+
+	def multi_rounding(self,method='standard',hyperplanes=1000):
+		#one SDP solve, K hyperplanes drawn as one (K,N) matrix and all the K cuts evaluated in batch
+		#outputs the best partition, its cut value and the values of all the K cuts
+		V = self.sdp_solve(method=method)
+		N = V.shape[1]
+		R = self.rng.normal(0,1,(hyperplanes,N))
+		partitions = hyperplane_rounding(V,R)
+		values = batch_cut_values(self.graph,partitions)
+		best = np.argmax(values)
+		return partitions[best], values[best], values
 
 
-	def deter_rounding_vector(self,method='standard',search_space=50):
+	def deter_rounding_vector(self,method='standard',search_space=50,seed=45):
 		#Watch proof, and check how to enumerate all posibilities of 
 		#normal distrib with specific rand gen
-		np.random.seed(45)
-		
+		#coordinate-wise search of r over np.linspace(-1,1,search_space), the current value is kept as
+		#first candidate so the cut never decreases
+		#the starting r comes from its own seeded generator, the global state is left alone
 		V = self.sdp_solve(method=method)
-		N = len(V)
-		r = np.random.normal(0,1,N)
-		if np.allclose(self.matrix, np.tril(self.matrix)) or np.allclose(self.matrix, np.triu(self.matrix)):
-			A = self.matrix+self.matrix.T
-		else: 
-			A = self.matrix
+		N = V.shape[1]
+		r = make_rng(seed).normal(0,1,N)
+		search = np.linspace(-1,1,search_space)
+		projection = V @ r
 		for coord in range(N):
-			result2 = []
-			search = np.array((np.linspace(-1,1,search_space),np.array(r[coord])))
-			for value in :
-				r[coord] = value
-				M = np.matmul(r,V)>0		
-				S = [i for i in range(len(M)) if M[i]]
-				T = [vertex for vertex in self.vertices if vertex not in S]
-				result2.append(np.sum(A[S,:][:,T]))
-			r[coord] = list(search)[np.argmax(result2)]
-		return np.matmul(r,V)>0
-
-	def solve(self,method='standard',random=1):
+			candidates = np.concatenate(([r[coord]],search))
+			#changing r[coord] is a rank-1 update of V @ r, one row per candidate
+			P = projection + np.outer(candidates-r[coord],V[:,coord])
+			values = batch_cut_values(self.graph,P>0)
+			best = np.argmax(values)
+			r[coord], projection = candidates[best], P[best]
+		return projection>0
+
+	def solve(self,method='standard',random=1,hyperplanes=1):
+		if random and hyperplanes > 1: return self.multi_rounding(method=method,hyperplanes=hyperplanes)[1]
 		if random: M = self.proba_rounding_vector(method=method)
-		else: M = self.deter_rounding_vector()
-		S = [i for i in range(len(M)) if M[i]]
-		T = [vertex for vertex in self.vertices if vertex not in S]
-		
-
-		# check if upper triangular or lower triangular because some formats of graphs give upper/lower only
-		if np.allclose(self.matrix, np.tril(self.matrix)) or np.allclose(self.matrix, np.triu(self.matrix)):
-			A = self.matrix+self.matrix.T
-			return np.sum(A[S,:][:,T])
-		else: return np.sum(self.matrix[S,:][:,T])
-
+		else: M = self.deter_rounding_vector(method=method)
+		return cut_value(self.graph,M)